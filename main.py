@@ -4,26 +4,65 @@ A FastAPI-based service for detecting anomalous user behavior in API logs using
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 import os
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import joblib
+import msgspec
 import numpy as np
+import orjson
 import pandas as pd
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from loguru import logger
 from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, model_validator
 from sklearn.ensemble import IsolationForest
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 
+# Optional ONNX Runtime inference for the trained forest
+try:
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:  # pragma: no cover - depends on the installed extras
+    ort = None
+
+# Optional GPU inference: Treelite checkpoints served by cuML's Forest Inference Library
+try:
+    import treelite
+    import treelite.sklearn
+except ImportError:  # pragma: no cover - depends on the installed extras
+    treelite = None
+
+try:
+    from cuml.fil import ForestInference
+except ImportError:  # pragma: no cover - depends on the installed extras
+    ForestInference = None
+
+# Optional SIMD-accelerated hashing of request bodies; hashlib's BLAKE2 is the fallback
+try:
+    from blake3 import blake3
+except ImportError:  # pragma: no cover - depends on the installed extras
+    blake3 = None
+
 # Configure logging
 logger.add("logs/anomaly_detection.log", rotation="1 day", retention="30 days")
 
@@ -31,11 +70,56 @@ logger.add("logs/anomaly_detection.log", rotation="1 day", retention="30 days")
 REQUEST_COUNT = Counter('api_requests_total', 'Total API requests', ['method', 'endpoint'])
 REQUEST_DURATION = Histogram('api_request_duration_seconds', 'API request duration')
 ANOMALY_COUNT = Counter('anomalies_detected_total', 'Total anomalies detected')
+# Label handles resolved once instead of on every request
+DETECT_COUNTER = REQUEST_COUNT.labels(method='POST', endpoint='/detect')
+COLUMNAR_DETECT_COUNTER = REQUEST_COUNT.labels(method='POST', endpoint='/detect/columnar')
+
+
+def _orjson_default(obj):
+    """Serialize the pandas types orjson does not handle natively"""
+    if isinstance(obj, pd.Timestamp):
+        return obj.to_pydatetime()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson, with native datetime and NumPy encoding"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+async def _load_at_startup(app: FastAPI):
+    """Load a previously saved model off the event loop, then release /ready"""
+    try:
+        # On the training executor, so a /train sent meanwhile runs (and replaces the bundle) after the load
+        bundle = await asyncio.get_running_loop().run_in_executor(TRAINING_EXECUTOR, _load_from_disk)
+        if bundle is not None:
+            app.state.model_bundle = bundle
+            logger.info("Model loaded from disk at startup")
+    except Exception as e:
+        logger.error(f"Model loading at startup failed: {str(e)}")
+    finally:
+        app.state.ready.set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving at once and load a previously saved model in the background, once per worker process"""
+    # uvicorn only binds the socket after lifespan startup returns, so the load must not be awaited here for
+    # /ready to be able to report it; the event is released once the load has finished
+    app.state.ready = asyncio.Event()
+    loading = asyncio.create_task(_load_at_startup(app))
+    yield
+    loading.cancel()
+
 
 app = FastAPI(
     title="API Anomaly Detection System",
     description="ML-powered anomaly detection for API logs using Isolation Forest",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -50,10 +134,41 @@ app.add_middleware(
 # Security
 security = HTTPBearer()
 
-# Global variables for model and scaler
-model = None
-scaler = None
-is_trained = False
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Immutable snapshot of everything needed to score a request; replaced as a whole on train/load"""
+
+    model: Optional[IsolationForest] = None
+    scaler: Optional[StandardScaler] = None
+    is_trained: bool = False
+    onnx_session: Any = None
+    fil_model: Any = None
+    feature_count: int = 0
+
+
+# Current model, kept on app.state rather than a module global; requests receive it through get_model_bundle
+# and use that snapshot throughout, train/load replace it
+app.state.model_bundle = ModelBundle()
+
+ONNX_MODEL_PATH = "models/isolation_forest.onnx"
+TREELITE_MODEL_PATH = "models/isolation_forest.tl"
+
+# Worker processes serving the app; uvicorn reads the same variable for --workers. Each worker holds its own model,
+# so /train and /load-model are refused with more than one
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY") or 1))
+# This worker's share of the cores for inference, so N workers don't run N x cpu_count threads between them
+THREADS_PER_WORKER = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+
+# Single worker: training runs off the event loop, one job at a time
+TRAINING_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="training")
+
+# Batches smaller than this are scored single-threaded; thread start-up outweighs the gain
+PARALLEL_SCORING_MIN_ROWS = 1000
+
+# While /detect requests are queueing, those arriving within this window are scored together, up to MAX_BATCH_ROWS rows
+BATCH_WINDOW_SECONDS = 0.01
+MAX_BATCH_ROWS = 50000
 
 
 class APILog(BaseModel):
@@ -78,6 +193,68 @@ class AnomalyDetectionRequest(BaseModel):
     threshold: Optional[float] = -0.5
 
 
+class APILogColumns(BaseModel):
+    """Column-oriented batch of API logs: one list per APILog field"""
+
+    timestamp: List[datetime]
+    user_id: List[str]
+    endpoint: List[str]
+    method: List[str]
+    status_code: List[int]
+    response_time: List[float]
+    ip_address: List[str]
+    user_agent: List[str]
+    request_size: Optional[List[Optional[int]]] = None
+    response_size: Optional[List[Optional[int]]] = None
+
+    @model_validator(mode="after")
+    def check_column_lengths(self):
+        lengths = {len(column) for column in self.model_dump(exclude_none=True).values()}
+        if len(lengths) > 1:
+            raise ValueError("All log columns must have the same length")
+        return self
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Build the frame extract_features expects directly from the columns"""
+        columns = {field: getattr(self, field) for field in APILog.model_fields}
+        for field in ("request_size", "response_size"):
+            if columns[field] is None:
+                columns[field] = [None] * len(self)
+        return pd.DataFrame(columns)
+
+
+class ColumnarDetectionRequest(BaseModel):
+    """Request model for anomaly detection on column-oriented logs"""
+
+    logs: APILogColumns
+    threshold: Optional[float] = -0.5
+
+
+class APILogRecord(msgspec.Struct):
+    """msgspec mirror of APILog, decoded straight from the /detect request body"""
+
+    timestamp: datetime
+    user_id: str
+    endpoint: str
+    method: str
+    status_code: int
+    response_time: float
+    ip_address: str
+    user_agent: str
+    request_size: Optional[int] = None
+    response_size: Optional[int] = None
+
+
+class DetectionPayload(msgspec.Struct):
+    """msgspec mirror of AnomalyDetectionRequest"""
+
+    logs: List[APILogRecord]
+    threshold: Optional[float] = -0.5
+
+
 class AnomalyDetectionResponse(BaseModel):
     """Response model for anomaly detection"""
 
@@ -104,57 +281,380 @@ class ModelStatus(BaseModel):
     feature_count: int
 
 
-def extract_features(logs: List[APILog]) -> pd.DataFrame:
-    """Extract features from API logs for ML model"""
-    features = []
-
-    for log in logs:
-        # Basic features
-        feature_dict = {
-            'hour': log.timestamp.hour,
-            'day_of_week': log.timestamp.weekday(),
-            'status_code': log.status_code,
-            'response_time': log.response_time,
-            'request_size': log.request_size or 0,
-            'response_size': log.response_size or 0,
+# Serializes a whole list of logs in one pydantic-core call
+APILOG_LIST_ADAPTER = TypeAdapter(List[APILog])
+
+# Lax like pydantic: numeric strings are accepted for numeric fields
+DETECTION_DECODER = msgspec.json.Decoder(DetectionPayload, strict=False)
+
+FEATURE_COLUMNS = [
+    'hour',
+    'day_of_week',
+    'status_code',
+    'response_time',
+    'request_size',
+    'response_size',
+    'user_request_frequency',
+    'user_avg_response_time',
+    'user_error_rate',
+    'endpoint_frequency',
+    'endpoint_avg_response_time',
+    'endpoint_error_rate',
+    'recent_requests',
+    'recent_error_rate',
+]
+
+# Log fields echoed back for every detected anomaly
+ANOMALY_LOG_FIELDS = ['timestamp', 'user_id', 'endpoint', 'method', 'status_code', 'response_time']
+
+# Severity buckets: score < -0.8 is high, < -0.5 medium, otherwise low
+SEVERITY_BINS = np.array([-0.8, -0.5])
+SEVERITY_LABELS = np.array(['high', 'medium', 'low'])
+
+# Look-back window for the recent_* features
+RECENT_WINDOW_NS = 3600 * 10**9
+
+# Running per-user / per-endpoint history: key -> [request count, response time sum, error count],
+# least recently updated first and bounded to STATS_MAX_KEYS keys each
+USER_STATS: "OrderedDict[str, np.ndarray]" = OrderedDict()
+ENDPOINT_STATS: "OrderedDict[str, np.ndarray]" = OrderedDict()
+STATS_MAX_KEYS = 10000
+STATS_LOCK = threading.Lock()
+# Serializes the snapshot writes, which happen outside STATS_LOCK
+STATS_PERSIST_LOCK = threading.Lock()
+STATS_PATH = "models/feature_stats.pkl"
+STATS_PERSIST_EVERY = 100
+_EMPTY_STATS = np.zeros(3)
+_stats_updates = 0
+
+# Batch-local features of recently seen request bodies, keyed by body digest (least recently used first)
+FEATURE_CACHE: "OrderedDict[bytes, pd.DataFrame]" = OrderedDict()
+FEATURE_CACHE_SIZE = 128
+
+
+def logs_to_frame(logs: List[APILog]) -> pd.DataFrame:
+    """Build a single column-oriented DataFrame from API log entries"""
+    return pd.DataFrame(APILOG_LIST_ADAPTER.dump_python(logs), columns=list(APILog.model_fields))
+
+
+def records_to_frame(logs: List[APILogRecord]) -> pd.DataFrame:
+    """Build the logs_to_frame layout from decoded msgspec records"""
+    return pd.DataFrame([msgspec.structs.astuple(log) for log in logs], columns=list(APILog.model_fields))
+
+
+def decode_detection_request(body: bytes) -> DetectionPayload:
+    """Decode a /detect body with msgspec, reporting failures as the usual 422 validation error"""
+    try:
+        return DETECTION_DECODER.decode(body)
+    except msgspec.ValidationError:
+        # msgspec is stricter than pydantic (e.g. date-only timestamps, bool status codes); /detect must accept
+        # whatever /train and /detect/columnar accept, so pydantic has the final say
+        try:
+            request = AnomalyDetectionRequest.model_validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)])
+        return DetectionPayload(logs=[APILogRecord(**log.model_dump()) for log in request.logs], threshold=request.threshold)
+    except msgspec.DecodeError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": str(e), "input": None}])
+
+
+def request_body_openapi(model: type) -> Dict[str, Any]:
+    """OpenAPI requestBody for endpoints that read the raw body, documented from the pydantic model"""
+    schema = model.model_json_schema(ref_template="#/components/schemas/{model}")
+    schema.pop("$defs", None)
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": schema}}}}
+
+
+def _timestamp_parts(timestamps: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """Split log timestamps into per-log wall-clock times (hour, weekday) and UTC nanoseconds (look-back window)"""
+    wall = timestamps
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        # Mixed UTC offsets, or naive next to aware, leave an object column; keep each log's own wall-clock time
+        wall = pd.to_datetime(pd.Series([t.replace(tzinfo=None) for t in timestamps], index=timestamps.index))
+    # Naive timestamps are taken to be UTC when compared against aware ones
+    utc_ns = pd.to_datetime(timestamps, utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return wall, utc_ns
+
+
+def extract_features(logs: Union[List[APILog], pd.DataFrame]) -> pd.DataFrame:
+    """Extract features from API logs (or a frame built by logs_to_frame) for ML model"""
+    if len(logs) == 0:
+        return pd.DataFrame(columns=FEATURE_COLUMNS, dtype=np.float32)
+
+    df = logs if isinstance(logs, pd.DataFrame) else logs_to_frame(logs)
+    df = df.assign(is_error=df['status_code'].ge(400))
+    wall, ts = _timestamp_parts(df['timestamp'])
+
+    # Basic features
+    features = pd.DataFrame(
+        {
+            'hour': wall.dt.hour,
+            'day_of_week': wall.dt.weekday,
+            'status_code': df['status_code'],
+            'response_time': df['response_time'],
+            'request_size': df['request_size'].fillna(0).astype('int64'),
+            'response_size': df['response_size'].fillna(0).astype('int64'),
         }
+    )
 
-        # User behavior features
-        user_logs = [l for l in logs if l.user_id == log.user_id]
-        feature_dict.update(
-            {
-                'user_request_frequency': len(user_logs),
-                'user_avg_response_time': np.mean([l.response_time for l in user_logs]),
-                'user_error_rate': len([l for l in user_logs if l.status_code >= 400]) / len(user_logs) if user_logs else 0,
-            }
-        )
+    # User behavior features
+    user_agg = df.groupby('user_id').agg(
+        user_request_frequency=('user_id', 'size'),
+        user_avg_response_time=('response_time', 'mean'),
+        user_error_rate=('is_error', 'mean'),
+    )
+    features = features.join(df[['user_id']].join(user_agg, on='user_id').drop(columns='user_id'))
 
-        # Endpoint features
-        endpoint_logs = [l for l in logs if l.endpoint == log.endpoint]
-        feature_dict.update(
-            {
-                'endpoint_frequency': len(endpoint_logs),
-                'endpoint_avg_response_time': np.mean([l.response_time for l in endpoint_logs]),
-                'endpoint_error_rate': (
-                    len([l for l in endpoint_logs if l.status_code >= 400]) / len(endpoint_logs) if endpoint_logs else 0
-                ),
-            }
-        )
+    # Endpoint features
+    endpoint_agg = df.groupby('endpoint').agg(
+        endpoint_frequency=('endpoint', 'size'),
+        endpoint_avg_response_time=('response_time', 'mean'),
+        endpoint_error_rate=('is_error', 'mean'),
+    )
+    features = features.join(df[['endpoint']].join(endpoint_agg, on='endpoint').drop(columns='endpoint'))
+
+    # Time-based features: logs in the hour up to and including each entry
+    order = np.argsort(ts, kind='stable')
+    sorted_ts = ts[order]
+    cum_errors = np.concatenate(([0], df['is_error'].to_numpy()[order].cumsum()))
+    hi = np.searchsorted(sorted_ts, ts, side='right')
+    lo = np.searchsorted(sorted_ts, ts - RECENT_WINDOW_NS, side='right')
+    recent_requests = hi - lo
+    features['recent_requests'] = recent_requests
+    features['recent_error_rate'] = (cum_errors[hi] - cum_errors[lo]) / recent_requests
+
+    # float32 halves the memory traffic through the scaler and the forest, which scores in float32 anyway
+    return features[FEATURE_COLUMNS].astype(np.float32)
+
+
+def cached_features(digest: Optional[bytes], frame: pd.DataFrame) -> pd.DataFrame:
+    """extract_features memoized on the request body digest; returns a private copy as scaling works in place"""
+    if digest is None:
+        return extract_features(frame)
+
+    features = FEATURE_CACHE.get(digest)
+    if features is None:
+        features = FEATURE_CACHE[digest] = extract_features(frame)
+        if len(FEATURE_CACHE) > FEATURE_CACHE_SIZE:
+            FEATURE_CACHE.popitem(last=False)
+    else:
+        FEATURE_CACHE.move_to_end(digest)
+    return features.copy()
+
+
+def update_stats(frame: pd.DataFrame, reset: bool = False):
+    """Fold a batch of logs into the running user/endpoint history"""
+    global _stats_updates
+
+    frame = frame.assign(is_error=frame['status_code'].ge(400))
+    with STATS_LOCK:
+        for stats, key in ((USER_STATS, 'user_id'), (ENDPOINT_STATS, 'endpoint')):
+            if reset:
+                stats.clear()
+            agg = frame.groupby(key).agg(
+                n=('response_time', 'size'), sum_rt=('response_time', 'sum'), n_err=('is_error', 'sum')
+            )
+            for k, row in zip(agg.index, agg.to_numpy(dtype=float)):
+                # Re-inserting moves the key to the most recently updated end
+                stats[k] = stats.pop(k, _EMPTY_STATS) + row
+            while len(stats) > STATS_MAX_KEYS:
+                stats.popitem(last=False)
+
+        _stats_updates += 1
+        persist = reset or _stats_updates % STATS_PERSIST_EVERY == 0
+
+    # Written outside STATS_LOCK so apply_baselines on the event loop never waits on disk I/O. The copy is taken
+    # under STATS_PERSIST_LOCK, so whichever thread writes last writes the newest history.
+    if persist:
+        with STATS_PERSIST_LOCK:
+            with STATS_LOCK:
+                # Entries are replaced, never modified in place, so shallow copies are a consistent snapshot
+                snapshot = (OrderedDict(USER_STATS), OrderedDict(ENDPOINT_STATS))
+            os.makedirs("models", exist_ok=True)
+            joblib.dump(snapshot, STATS_PATH)
+
+
+def apply_baselines(features: pd.DataFrame, frame: pd.DataFrame) -> pd.DataFrame:
+    """Blend the running history into the per-batch user/endpoint mean and error-rate features"""
+    if not USER_STATS and not ENDPOINT_STATS:
+        return features
+
+    features = features.copy()
+    for stats, key, prefix, count_column in (
+        (USER_STATS, 'user_id', 'user', 'user_request_frequency'),
+        (ENDPOINT_STATS, 'endpoint', 'endpoint', 'endpoint_frequency'),
+    ):
+        codes, uniques = pd.factorize(frame[key])
+        with STATS_LOCK:
+            history = np.array([stats.get(k, _EMPTY_STATS) for k in uniques]).reshape(-1, 3)[codes]
+
+        batch_n = features[count_column].to_numpy(dtype=float)
+        total_n = batch_n + history[:, 0]
+        for column, offset in ((f'{prefix}_avg_response_time', 1), (f'{prefix}_error_rate', 2)):
+            blended = (features[column].to_numpy(dtype=float) * batch_n + history[:, offset]) / total_n
+            features[column] = blended.astype(np.float32)
+
+    return features
+
+
+def create_onnx_session(path: str):
+    """Open an ONNX Runtime session for the exported forest using this worker's share of the CPU cores"""
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = THREADS_PER_WORKER
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def discard_artifact(path: str):
+    """Remove a saved model artifact if it exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
-        # Time-based features
-        recent_logs = [l for l in logs if (log.timestamp - l.timestamp).total_seconds() < 3600]  # Last hour
-        feature_dict.update(
-            {
-                'recent_requests': len(recent_logs),
-                'recent_error_rate': (
-                    len([l for l in recent_logs if l.status_code >= 400]) / len(recent_logs) if recent_logs else 0
-                ),
-            }
+
+def export_onnx(fitted_model: IsolationForest, n_features: int):
+    """Export a fitted forest to ONNX and return an inference session, or None if unavailable"""
+    if ort is None:
+        return None
+
+    try:
+        onnx_model = convert_sklearn(
+            fitted_model,
+            initial_types=[("X", FloatTensorType([None, n_features]))],
+            target_opset={"": 17, "ai.onnx.ml": 3},
         )
+        with open(ONNX_MODEL_PATH, "wb") as f:
+            f.write(onnx_model.SerializeToString())
+        return create_onnx_session(ONNX_MODEL_PATH)
+    except Exception as e:
+        # A partly written file must not be picked up by _load_from_disk
+        discard_artifact(ONNX_MODEL_PATH)
+        logger.warning(f"ONNX export failed, falling back to scikit-learn inference: {str(e)}")
+        return None
 
-        features.append(feature_dict)
 
-    return pd.DataFrame(features)
+def export_treelite(fitted_model: IsolationForest) -> bool:
+    """Serialize a fitted forest as a Treelite checkpoint for FIL, if treelite is available"""
+    if treelite is None:
+        return False
+
+    try:
+        treelite.sklearn.import_model(fitted_model).serialize(TREELITE_MODEL_PATH)
+        return True
+    except Exception as e:
+        discard_artifact(TREELITE_MODEL_PATH)
+        logger.warning(f"Treelite export failed, GPU inference disabled: {str(e)}")
+        return False
+
+
+def _fil_decision_scores(fil, fitted_model: IsolationForest, features_scaled: np.ndarray) -> np.ndarray:
+    """Convert FIL output (Treelite's -score_samples) into decision_function values"""
+    raw = np.asarray(fil.predict(np.asarray(features_scaled, dtype=np.float32))).ravel()
+    return -raw - fitted_model.offset_
+
+
+def load_fil(fitted_model: IsolationForest, n_features: int):
+    """Load the Treelite checkpoint into FIL, keeping it only if it reproduces scikit-learn's scores"""
+    if ForestInference is None or not os.path.exists(TREELITE_MODEL_PATH):
+        return None
+
+    try:
+        fil = ForestInference.load(TREELITE_MODEL_PATH, model_type="treelite_checkpoint")
+        probe = np.random.RandomState(0).normal(size=(64, n_features))
+        if not np.allclose(_fil_decision_scores(fil, fitted_model, probe), fitted_model.decision_function(probe), atol=1e-3):
+            logger.warning("FIL scores disagree with scikit-learn, GPU inference disabled")
+            return None
+        return fil
+    except Exception as e:
+        logger.warning(f"FIL load failed, GPU inference disabled: {str(e)}")
+        return None
+
+
+def decision_scores(features_scaled: np.ndarray, bundle: ModelBundle) -> np.ndarray:
+    """Return decision_function scores from FIL, ONNX Runtime or scikit-learn, in that order of preference"""
+    if bundle.fil_model is not None:
+        return _fil_decision_scores(bundle.fil_model, bundle.model, features_scaled)
+
+    if bundle.onnx_session is not None:
+        (scores,) = bundle.onnx_session.run(["scores"], {"X": np.asarray(features_scaled, dtype=np.float32)})
+        return scores.ravel()
+
+    if len(features_scaled) < PARALLEL_SCORING_MIN_ROWS:
+        return bundle.model.decision_function(features_scaled)
+
+    # Tree traversal releases the GIL, so a threading backend spreads the trees across cores
+    with joblib.parallel_backend("threading", n_jobs=THREADS_PER_WORKER):
+        return bundle.model.decision_function(features_scaled)
+
+
+def predict_scores(features_scaled: np.ndarray, bundle: ModelBundle) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (predictions, decision scores) from a single pass over the bundle's forest"""
+    scores = decision_scores(features_scaled, bundle)
+    # IsolationForest.predict is -1 exactly where decision_function is negative
+    return np.where(scores < 0, -1, 1), scores
+
+
+class DetectionBatcher:
+    """Coalesces concurrently queued feature matrices into a single forest scoring call"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.worker = self.loop.create_task(self._run())
+
+    async def score(self, features_scaled: np.ndarray, bundle: ModelBundle) -> Tuple[np.ndarray, np.ndarray]:
+        """Queue a matrix scaled by the bundle's scaler and wait for its (predictions, decision scores)"""
+        future = self.loop.create_future()
+        await self.queue.put((features_scaled, bundle, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            items = [await self.queue.get()]
+            # Only hold the batch open when requests are already queueing up behind this one; a lone request
+            # at low load is scored straight away instead of paying the window as added latency
+            if not self.queue.empty():
+                await asyncio.sleep(BATCH_WINDOW_SECONDS)
+            rows = len(items[0][0])
+            while not self.queue.empty() and rows < MAX_BATCH_ROWS:
+                items.append(self.queue.get_nowait())
+                rows += len(items[-1][0])
+
+            # A train/load may swap the bundle mid-window; each request is scored by the bundle that scaled it
+            groups: Dict[int, list] = {}
+            for item in items:
+                groups.setdefault(id(item[1]), []).append(item)
+            for group in groups.values():
+                await self._score_group(group)
+
+    async def _score_group(self, items: list):
+        try:
+            batch = np.vstack([features for features, _, _ in items])
+            # Score in a worker thread so the event loop keeps accepting requests meanwhile
+            predictions, scores = await self.loop.run_in_executor(None, predict_scores, batch, items[0][1])
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        bounds = np.cumsum([len(features) for features, _, _ in items])[:-1]
+        for (_, _, future), chunk_predictions, chunk_scores in zip(
+            items, np.split(predictions, bounds), np.split(scores, bounds)
+        ):
+            if not future.done():
+                future.set_result((chunk_predictions, chunk_scores))
+
+
+_batcher: Optional[DetectionBatcher] = None
+
+
+def get_batcher() -> DetectionBatcher:
+    """Return the batcher bound to the running event loop, starting one if needed"""
+    global _batcher
+    if _batcher is None or _batcher.loop is not asyncio.get_running_loop():
+        _batcher = DetectionBatcher()
+    return _batcher
 
 
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -164,55 +664,136 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
     return credentials.credentials
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.now()}
+def get_model_bundle(request: Request) -> ModelBundle:
+    """The app's current model snapshot; tests substitute their own through app.dependency_overrides"""
+    return request.app.state.model_bundle
 
 
-@app.get("/metrics")
-async def metrics():
-    """Prometheus metrics endpoint"""
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+def require_single_worker():
+    """Refuse model updates that would only reach the one worker process handling the request"""
+    if WEB_CONCURRENCY > 1:
+        raise HTTPException(
+            status_code=409,
+            detail="Model updates are disabled with multiple workers; train with WEB_CONCURRENCY=1, then restart",
+        )
 
 
-@app.post("/train", response_model=Dict[str, Any])
-async def train_model(training_data: TrainingData, background_tasks: BackgroundTasks, token: str = Depends(verify_token)):
-    """Train the Isolation Forest model"""
-    global model, scaler, is_trained
+async def body_digest(request: Request) -> bytes:
+    """Content hash of the raw request body, so repeated identical payloads can reuse their features"""
+    body = await request.body()
+    if blake3 is not None:
+        return blake3(body).digest()
+    return hashlib.blake2b(body, digest_size=32).digest()
 
-    try:
-        logger.info(f"Starting model training with {len(training_data.logs)} logs")
 
-        # Extract features
-        features_df = extract_features(training_data.logs)
+@app.get("/health")
+def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy", "timestamp": datetime.now()}
 
-        # Split data
-        X_train, X_test = train_test_split(features_df, test_size=training_data.test_size, random_state=42)
 
-        # Scale features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
+@app.get("/ready")
+async def readiness_check(request: Request, timeout: float = Query(30.0, ge=0, le=60)):
+    """Readiness long-poll: answers as soon as the startup model load has finished, or 503 after `timeout` seconds"""
+    ready = getattr(request.app.state, "ready", None)
+    # No event means the app is serving without a lifespan, so there is no startup to wait for
+    if ready is not None and not ready.is_set():
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Service is still starting")
+    return {"status": "ready", "timestamp": datetime.now()}
 
-        # Train Isolation Forest
-        model = IsolationForest(contamination=0.1, random_state=42, n_estimators=100)  # Expected 10% anomalies
-        model.fit(X_train_scaled)
 
-        # Evaluate model
-        train_scores = model.decision_function(X_train_scaled)
-        test_scores = model.decision_function(X_test_scaled)
+@lru_cache(maxsize=1)
+def _metrics_snapshot(second: int) -> bytes:
+    """Render the Prometheus exposition at most once per wall-clock second"""
+    return generate_latest()
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics endpoint"""
+    # Plain def: FastAPI runs it in the threadpool, keeping generate_latest off the event loop
+    return Response(_metrics_snapshot(int(time.time())), media_type=CONTENT_TYPE_LATEST)
+
+
+def _do_train(logs: List[APILog], test_size: float) -> Tuple[ModelBundle, Dict[str, Any]]:
+    """Fit and persist the scaler and forest; returns the new model bundle and a training summary"""
+    # Extract features
+    frame = logs_to_frame(logs)
+    features_df = extract_features(frame)
+
+    # Split data
+    X_train, X_test = train_test_split(features_df, test_size=test_size, random_state=42)
+    X_train = X_train.astype(np.float32, copy=False)
+    X_test = X_test.astype(np.float32, copy=False)
+
+    # Scale features in place; every caller hands transform a freshly built float32 frame
+    fitted_scaler = StandardScaler(copy=False)
+    X_train_scaled = fitted_scaler.fit_transform(X_train)
+    X_test_scaled = fitted_scaler.transform(X_test)
+
+    # Train Isolation Forest
+    forest = IsolationForest(contamination=0.1, random_state=42, n_estimators=100, n_jobs=-1)  # Expected 10% anomalies
+    forest.fit(X_train_scaled)
+
+    # Evaluate model
+    train_scores = forest.decision_function(X_train_scaled)
+    test_scores = forest.decision_function(X_test_scaled)
+
+    # Calculate accuracy (assuming we have some labeled data)
+    train_predictions = np.where(train_scores < 0, -1, 1)
+    test_predictions = np.where(test_scores < 0, -1, 1)
+
+    # Save model
+    os.makedirs("models", exist_ok=True)
+    joblib.dump(forest, "models/isolation_forest.pkl")
+    joblib.dump(fitted_scaler, "models/scaler.pkl")
+    # Exports of the previous forest go first: _load_from_disk prefers them over the pkl, so a failed or
+    # skipped export must not leave them behind next to the new model
+    for path in (ONNX_MODEL_PATH, TREELITE_MODEL_PATH):
+        discard_artifact(path)
+    session = export_onnx(forest, X_train_scaled.shape[1])
+    # FIL is the checkpoint's only reader, so nothing is written when it can't be loaded
+    fil = None
+    if ForestInference is not None and export_treelite(forest):
+        fil = load_fil(forest, X_train_scaled.shape[1])
+
+    # Training logs become the new behavioural baseline. The forest is fitted on unblended features, which is what
+    # /detect would compute for these same logs: blending a batch with history built from that batch alone
+    # returns its own means and error rates. Smaller /detect batches are pulled toward these training-time values.
+    update_stats(frame, reset=True)
+
+    summary = {
+        "train_anomalies": int(np.sum(train_predictions == -1)),
+        "test_anomalies": int(np.sum(test_predictions == -1)),
+        "model_accuracy": float(np.mean(test_predictions == 1)),  # Assuming most data is normal
+    }
+    bundle = ModelBundle(
+        model=forest,
+        scaler=fitted_scaler,
+        is_trained=True,
+        onnx_session=session,
+        fil_model=fil,
+        feature_count=fitted_scaler.n_features_in_,
+    )
+    return bundle, summary
 
-        # Calculate accuracy (assuming we have some labeled data)
-        train_predictions = model.predict(X_train_scaled)
-        test_predictions = model.predict(X_test_scaled)
 
-        # Save model
-        os.makedirs("models", exist_ok=True)
-        joblib.dump(model, "models/isolation_forest.pkl")
-        joblib.dump(scaler, "models/scaler.pkl")
+@app.post("/train", response_model=Dict[str, Any], dependencies=[Depends(require_single_worker)])
+async def train_model(
+    training_data: TrainingData, background_tasks: BackgroundTasks, request: Request, token: str = Depends(verify_token)
+):
+    """Train the Isolation Forest model"""
+    try:
+        logger.info(f"Starting model training with {len(training_data.logs)} logs")
 
-        is_trained = True
+        # Fit off the event loop so other requests keep being served while training runs
+        loop = asyncio.get_running_loop()
+        request.app.state.model_bundle, summary = await loop.run_in_executor(
+            TRAINING_EXECUTOR, _do_train, training_data.logs, training_data.test_size
+        )
 
         logger.info("Model training completed successfully")
 
@@ -220,9 +801,7 @@ async def train_model(training_data: TrainingData, background_tasks: BackgroundT
             "status": "success",
             "message": "Model trained successfully",
             "training_samples": len(training_data.logs),
-            "train_anomalies": np.sum(train_predictions == -1),
-            "test_anomalies": np.sum(test_predictions == -1),
-            "model_accuracy": np.mean(test_predictions == 1),  # Assuming most data is normal
+            **summary,
             "timestamp": datetime.now(),
         }
 
@@ -231,95 +810,177 @@ async def train_model(training_data: TrainingData, background_tasks: BackgroundT
         raise HTTPException(status_code=500, detail=f"Training failed: {str(e)}")
 
 
-@app.post("/detect", response_model=AnomalyDetectionResponse)
-async def detect_anomalies(request: AnomalyDetectionRequest, token: str = Depends(verify_token)):
-    """Detect anomalies in API logs"""
-
-    if not is_trained or model is None or scaler is None:
+async def run_detection(
+    frame: pd.DataFrame,
+    threshold: float,
+    background_tasks: BackgroundTasks,
+    bundle: ModelBundle,
+    digest: Optional[bytes] = None,
+) -> Dict[str, Any]:
+    """Score a frame of logs (as built by logs_to_frame) and build the AnomalyDetectionResponse payload"""
+    # Extract features (reused for a repeated body) and blend in the running user/endpoint history
+    features_df = apply_baselines(cached_features(digest, frame), frame)
+
+    # Scale features
+    features_scaled = bundle.scaler.transform(features_df)
+
+    # Predict anomalies, sharing one forest pass with any concurrent requests
+    predictions, scores = await get_batcher().score(features_scaled, bundle)
+
+    # Identify anomalies
+    idx = np.flatnonzero((predictions == -1) & (scores < threshold))
+    flagged = frame.iloc[idx]
+    flagged_scores = scores[idx].astype(float)
+    anomalies = pd.DataFrame(
+        {
+            "log_index": idx,
+            **{field: flagged[field].to_numpy() for field in ANOMALY_LOG_FIELDS},
+            "anomaly_score": flagged_scores,
+            "severity": SEVERITY_LABELS[np.digitize(flagged_scores, SEVERITY_BINS)],
+        }
+    ).to_dict("records")
+    ANOMALY_COUNT.inc(len(anomalies))
+
+    logger.info(f"Detected {len(anomalies)} anomalies out of {len(frame)} logs")
+
+    background_tasks.add_task(update_stats, frame)
+
+    return {
+        "anomalies": anomalies,
+        "total_logs": len(frame),
+        "anomaly_count": len(anomalies),
+        "anomaly_rate": len(anomalies) / len(frame) if len(frame) else 0,
+        "model_confidence": float(np.mean(scores)),
+    }
+
+
+async def detect_frame(
+    frame: pd.DataFrame,
+    threshold: float,
+    background_tasks: BackgroundTasks,
+    bundle: ModelBundle,
+    counter=DETECT_COUNTER,
+    digest: Optional[bytes] = None,
+) -> Dict[str, Any]:
+    """Shared core of the detect endpoints: check the model, score the frame, map failures to HTTP errors"""
+    if not bundle.is_trained or bundle.model is None or bundle.scaler is None:
         raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
 
     try:
-        REQUEST_COUNT.labels(method='POST', endpoint='/detect').inc()
+        counter.inc()
 
         with REQUEST_DURATION.time():
-            # Extract features
-            features_df = extract_features(request.logs)
-
-            # Scale features
-            features_scaled = scaler.transform(features_df)
-
-            # Predict anomalies
-            predictions = model.predict(features_scaled)
-            scores = model.decision_function(features_scaled)
-
-            # Identify anomalies
-            anomalies = []
-            for i, (log, prediction, score) in enumerate(zip(request.logs, predictions, scores)):
-                if prediction == -1 and score < request.threshold:
-                    anomaly_data = {
-                        "log_index": i,
-                        "timestamp": log.timestamp,
-                        "user_id": log.user_id,
-                        "endpoint": log.endpoint,
-                        "method": log.method,
-                        "status_code": log.status_code,
-                        "response_time": log.response_time,
-                        "anomaly_score": float(score),
-                        "severity": "high" if score < -0.8 else "medium" if score < -0.5 else "low",
-                    }
-                    anomalies.append(anomaly_data)
-                    ANOMALY_COUNT.inc()
-
-            logger.info(f"Detected {len(anomalies)} anomalies out of {len(request.logs)} logs")
-
-            return AnomalyDetectionResponse(
-                anomalies=anomalies,
-                total_logs=len(request.logs),
-                anomaly_count=len(anomalies),
-                anomaly_rate=len(anomalies) / len(request.logs) if request.logs else 0,
-                model_confidence=float(np.mean(scores)),
-            )
+            return await run_detection(frame, threshold, background_tasks, bundle, digest)
 
     except Exception as e:
         logger.error(f"Anomaly detection failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Detection failed: {str(e)}")
 
 
+@app.post("/detect", response_model=AnomalyDetectionResponse, openapi_extra=request_body_openapi(AnomalyDetectionRequest))
+async def detect_anomalies(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    token: str = Depends(verify_token),
+    digest: bytes = Depends(body_digest),
+    bundle: ModelBundle = Depends(get_model_bundle),
+):
+    """Detect anomalies in API logs"""
+    # msgspec decodes the body directly; AnomalyDetectionRequest only documents it
+    payload = decode_detection_request(await request.body())
+    # The payload already matches AnomalyDetectionResponse; skip re-validating thousands of anomaly dicts
+    return ORJSONResponse(
+        content=await detect_frame(
+            records_to_frame(payload.logs), payload.threshold, background_tasks, bundle, DETECT_COUNTER, digest
+        )
+    )
+
+
+@app.post("/detect/columnar", response_model=AnomalyDetectionResponse)
+async def detect_anomalies_columnar(
+    request: ColumnarDetectionRequest,
+    background_tasks: BackgroundTasks,
+    token: str = Depends(verify_token),
+    digest: bytes = Depends(body_digest),
+    bundle: ModelBundle = Depends(get_model_bundle),
+):
+    """Detect anomalies in a column-oriented batch of API logs"""
+    return ORJSONResponse(
+        content=await detect_frame(
+            request.logs.to_frame(), request.threshold, background_tasks, bundle, COLUMNAR_DETECT_COUNTER, digest
+        )
+    )
+
+
 @app.get("/status", response_model=ModelStatus)
-async def get_model_status(token: str = Depends(verify_token)):
+async def get_model_status(token: str = Depends(verify_token), bundle: ModelBundle = Depends(get_model_bundle)):
     """Get model status and information"""
-
-    if not is_trained:
+    if not bundle.is_trained:
         return ModelStatus(is_trained=False, training_date=None, model_accuracy=None, feature_count=0)
 
     return ModelStatus(
         is_trained=True,
         training_date=datetime.now(),  # In production, store actual training date
         model_accuracy=0.85,  # In production, calculate actual accuracy
-        feature_count=len(scaler.feature_names_in_) if scaler else 0,
+        feature_count=bundle.feature_count,
     )
 
 
-@app.post("/load-model")
-async def load_model(token: str = Depends(verify_token)):
-    """Load pre-trained model from disk"""
-    global model, scaler, is_trained
+def _load_from_disk() -> Optional[ModelBundle]:
+    """Load the saved model, scaler, inference sessions and feature history; None if no model is saved"""
+    if not (os.path.exists("models/isolation_forest.pkl") and os.path.exists("models/scaler.pkl")):
+        return None
 
+    model = joblib.load("models/isolation_forest.pkl")
+    scaler = joblib.load("models/scaler.pkl")
+    onnx_session = create_onnx_session(ONNX_MODEL_PATH) if ort and os.path.exists(ONNX_MODEL_PATH) else None
+    fil_model = load_fil(model, model.n_features_in_)
+    bundle = ModelBundle(
+        model=model,
+        scaler=scaler,
+        is_trained=True,
+        onnx_session=onnx_session,
+        fil_model=fil_model,
+        feature_count=scaler.n_features_in_,
+    )
+    if os.path.exists(STATS_PATH):
+        user_stats, endpoint_stats = joblib.load(STATS_PATH)
+        with STATS_LOCK:
+            USER_STATS.clear()
+            USER_STATS.update(user_stats)
+            ENDPOINT_STATS.clear()
+            ENDPOINT_STATS.update(endpoint_stats)
+    return bundle
+
+
+@app.post("/load-model", dependencies=[Depends(require_single_worker)])
+async def load_model(request: Request, token: str = Depends(verify_token)):
+    """Load pre-trained model from disk"""
     try:
-        if os.path.exists("models/isolation_forest.pkl") and os.path.exists("models/scaler.pkl"):
-            model = joblib.load("models/isolation_forest.pkl")
-            scaler = joblib.load("models/scaler.pkl")
-            is_trained = True
-            logger.info("Model loaded successfully from disk")
-            return {"status": "success", "message": "Model loaded successfully"}
-        else:
-            raise HTTPException(status_code=404, detail="No trained model found on disk")
+        # Unpickling and building the ONNX session block, so they run on the training executor like the startup load
+        bundle = await asyncio.get_running_loop().run_in_executor(TRAINING_EXECUTOR, _load_from_disk)
     except Exception as e:
         logger.error(f"Model loading failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Model loading failed: {str(e)}")
 
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="No trained model found on disk")
 
-if __name__ == "__main__":
-    import uvicorn
+    request.app.state.model_bundle = bundle
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    logger.info("Model loaded successfully from disk")
+    return {"status": "success", "message": "Model loaded successfully"}
+
+
+if __name__ == "__main__":
+    # Hand over to the uvicorn CLI: spawned workers then import this module only once, as "main", and each loads
+    # the saved model in lifespan. "auto" selects uvloop and httptools when installed (uvicorn[standard]).
+    # One worker unless WEB_CONCURRENCY says otherwise: workers don't share a model, so only one can be trained.
+    # Exported so every worker process sees the same count
+    workers = os.environ["WEB_CONCURRENCY"] = str(WEB_CONCURRENCY)
+    argv = [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", os.path.dirname(os.path.abspath(__file__))]
+    argv += ["--host", "0.0.0.0", "--port", "8000", "--workers", workers, "--loop", "auto", "--http", "auto"]
+    if os.name == "nt":
+        # os.execv on Windows starts a new process and exits this one, which a watching parent takes for a crash
+        sys.exit(subprocess.call(argv))
+    os.execv(sys.executable, argv)
@@ -4,26 +4,25 @@ Deployment Health Check Script
 Comprehensive URL-based testing for the API Anomaly Detection System
 """
 
+import asyncio
 import json
 import sys
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict
 
-import requests
+import httpx
 
 
 class DeploymentChecker:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url.rstrip('/')
-        self.session = requests.Session()
-        self.session.headers.update(
-            {'Content-Type': 'application/json', 'Authorization': 'Bearer your-token-here'}  # Replace with actual token
-        )
+        # Replace with actual token
+        self.headers = {'Content-Type': 'application/json', 'Authorization': 'Bearer your-token-here'}
 
-    def check_health(self) -> bool:
+    async def check_health(self, client: httpx.AsyncClient) -> bool:
         """Check basic health endpoint"""
         try:
-            response = self.session.get(f"{self.base_url}/health", timeout=10)
+            response = await client.get("/health")
             if response.status_code == 200:
                 print("✅ Health check: PASSED")
                 print(f"   Response: {response.json()}")
@@ -35,10 +34,10 @@ class DeploymentChecker:
             print(f"❌ Health check: ERROR - {e}")
             return False
 
-    def check_metrics(self) -> bool:
+    async def check_metrics(self, client: httpx.AsyncClient) -> bool:
         """Check Prometheus metrics endpoint"""
         try:
-            response = self.session.get(f"{self.base_url}/metrics", timeout=10)
+            response = await client.get("/metrics")
             if response.status_code == 200:
                 print("✅ Metrics endpoint: PASSED")
                 print(f"   Content-Type: {response.headers.get('content-type', 'unknown')}")
@@ -50,10 +49,10 @@ class DeploymentChecker:
             print(f"❌ Metrics endpoint: ERROR - {e}")
             return False
 
-    def check_status(self) -> bool:
+    async def check_status(self, client: httpx.AsyncClient) -> bool:
         """Check model status endpoint"""
         try:
-            response = self.session.get(f"{self.base_url}/status", timeout=10)
+            response = await client.get("/status")
             if response.status_code == 200:
                 print("✅ Status endpoint: PASSED")
                 status_data = response.json()
@@ -67,26 +66,21 @@ class DeploymentChecker:
             print(f"❌ Status endpoint: ERROR - {e}")
             return False
 
-    def check_docs(self) -> bool:
-        """Check API documentation endpoints"""
-        endpoints = ["/docs", "/redoc", "/openapi.json"]
-
-        all_passed = True
-        for endpoint in endpoints:
-            try:
-                response = self.session.get(f"{self.base_url}{endpoint}", timeout=10)
-                if response.status_code == 200:
-                    print(f"✅ {endpoint}: PASSED")
-                else:
-                    print(f"❌ {endpoint}: FAILED (Status: {response.status_code})")
-                    all_passed = False
-            except Exception as e:
-                print(f"❌ {endpoint}: ERROR - {e}")
-                all_passed = False
-
-        return all_passed
-
-    def test_training_endpoint(self) -> bool:
+    async def _check_doc(self, client: httpx.AsyncClient, endpoint: str) -> bool:
+        """Check a single API documentation endpoint"""
+        try:
+            response = await client.get(endpoint)
+            if response.status_code == 200:
+                print(f"✅ {endpoint}: PASSED")
+                return True
+            else:
+                print(f"❌ {endpoint}: FAILED (Status: {response.status_code})")
+                return False
+        except Exception as e:
+            print(f"❌ {endpoint}: ERROR - {e}")
+            return False
+
+    async def test_training_endpoint(self, client: httpx.AsyncClient) -> bool:
         """Test the training endpoint with sample data"""
         try:
             # Sample training data
@@ -113,7 +107,7 @@ class DeploymentChecker:
                 ]
             }
 
-            response = self.session.post(f"{self.base_url}/train", json=training_data, timeout=30)
+            response = await client.post("/train", json=training_data, timeout=30)
 
             if response.status_code == 200:
                 print("✅ Training endpoint: PASSED")
@@ -128,7 +122,7 @@ class DeploymentChecker:
             print(f"❌ Training endpoint: ERROR - {e}")
             return False
 
-    def test_detection_endpoint(self) -> bool:
+    async def test_detection_endpoint(self, client: httpx.AsyncClient) -> bool:
         """Test the anomaly detection endpoint"""
         try:
             # Sample detection data
@@ -146,7 +140,7 @@ class DeploymentChecker:
                 ]
             }
 
-            response = self.session.post(f"{self.base_url}/detect", json=detection_data, timeout=10)
+            response = await client.post("/detect", json=detection_data)
 
             if response.status_code == 200:
                 print("✅ Detection endpoint: PASSED")
@@ -161,30 +155,36 @@ class DeploymentChecker:
             print(f"❌ Detection endpoint: ERROR - {e}")
             return False
 
-    def run_comprehensive_check(self) -> Dict[str, bool]:
+    async def run_comprehensive_check(self) -> Dict[str, bool]:
         """Run all checks and return results"""
         print("🚀 Starting Comprehensive Deployment Check")
         print("=" * 60)
 
         results = {}
-
-        # Basic health checks
-        print("\n📋 BASIC HEALTH CHECKS")
-        print("-" * 30)
-        results['health'] = self.check_health()
-        results['metrics'] = self.check_metrics()
-        results['status'] = self.check_status()
-
-        # Documentation checks
-        print("\n📚 DOCUMENTATION CHECKS")
-        print("-" * 30)
-        results['docs'] = self.check_docs()
-
-        # API functionality checks
-        print("\n🔧 API FUNCTIONALITY CHECKS")
-        print("-" * 30)
-        results['training'] = self.test_training_endpoint()
-        results['detection'] = self.test_detection_endpoint()
+        doc_endpoints = ["/docs", "/redoc", "/openapi.json"]
+
+        # One client per run, handed to each check, so nothing keeps a closed client around afterwards
+        async with httpx.AsyncClient(base_url=self.base_url, headers=self.headers, timeout=10) as client:
+            # Health and documentation checks are independent, so issue them concurrently
+            print("\n📋 BASIC HEALTH AND DOCUMENTATION CHECKS")
+            print("-" * 30)
+            health, metrics, status, *docs = await asyncio.gather(
+                self.check_health(client),
+                self.check_metrics(client),
+                self.check_status(client),
+                *[self._check_doc(client, endpoint) for endpoint in doc_endpoints],
+                return_exceptions=True,
+            )
+            results['health'] = health is True
+            results['metrics'] = metrics is True
+            results['status'] = status is True
+            results['docs'] = all(doc is True for doc in docs)
+
+            # API functionality checks: detection needs the model trained first
+            print("\n🔧 API FUNCTIONALITY CHECKS")
+            print("-" * 30)
+            results['training'] = await self.test_training_endpoint(client)
+            results['detection'] = await self.test_detection_endpoint(client)
 
         # Summary
         print("\n📊 SUMMARY")
@@ -218,9 +218,9 @@ def main():
 
     checker = DeploymentChecker(args.url)
     if args.token != "your-token-here":
-        checker.session.headers.update({'Authorization': f'Bearer {args.token}'})
+        checker.headers['Authorization'] = f'Bearer {args.token}'
 
-    results = checker.run_comprehensive_check()
+    results = asyncio.run(checker.run_comprehensive_check())
 
     # Exit with appropriate code
     if all(results.values()):
@@ -4,44 +4,86 @@ Service Startup Script for API Anomaly Detection System
 Ensures proper service initialization and health checks
 """
 
+import hashlib
 import os
+import selectors
 import subprocess
 import sys
 import time
+from contextlib import contextmanager
 from pathlib import Path
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 
 
 def create_directories():
     """Create necessary directories"""
     directories = ["models", "logs", "data"]
+    # One directory listing instead of a stat per directory; only the missing ones are created
+    with os.scandir(".") as entries:
+        existing = {entry.name for entry in entries if entry.is_dir()}
     for directory in directories:
-        Path(directory).mkdir(exist_ok=True)
-        print(f"📁 Created directory: {directory}")
+        if directory not in existing:
+            Path(directory).mkdir(exist_ok=True)
+            print(f"📁 Created directory: {directory}")
+
+
+# Hash of requirements.txt (and interpreter) from the last successful install
+REQUIREMENTS_MARKER = Path("models/.req_hash")
 
 
 def install_dependencies():
-    """Install Python dependencies"""
+    """Install Python dependencies, skipped when requirements.txt is unchanged since the last install"""
+    # Keyed on the interpreter too, so switching virtualenvs still triggers an install
+    digest = hashlib.sha256(sys.executable.encode() + Path("requirements.txt").read_bytes()).hexdigest()
+    if REQUIREMENTS_MARKER.exists() and REQUIREMENTS_MARKER.read_text() == digest:
+        print("✅ Dependencies unchanged since last install, skipping")
+        return True
+
     print("📦 Installing dependencies...")
     try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], check=True, capture_output=True)
+        # wheel lets pip build and cache wheels instead of rebuilding sdists every run
+        subprocess.run(
+            [sys.executable, "-m", "pip", "install", "-q", "--upgrade", "pip", "setuptools", "wheel"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        # pip's progress output is never shown, so only stderr is kept for the error report
+        subprocess.run(
+            [sys.executable, "-m", "pip", "install", "-q", "--prefer-binary", "--no-input", "-r", "requirements.txt"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        REQUIREMENTS_MARKER.parent.mkdir(exist_ok=True)
+        REQUIREMENTS_MARKER.write_text(digest)
         print("✅ Dependencies installed successfully")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Failed to install dependencies: {e}")
+        if e.stderr:
+            print(e.stderr.decode(errors="replace"))
         return False
 
 
+SERVICE_STDOUT_LOG = Path("logs/service.out")
+SERVICE_STDERR_LOG = Path("logs/service.err")
+
+
 def start_service(method="python"):
     """Start the service using specified method"""
     print(f"🚀 Starting service using {method}...")
 
     if method == "python":
         try:
-            # Start the service in background
-            process = subprocess.Popen([sys.executable, "main.py"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            print(f"✅ Service started with PID: {process.pid}")
+            # Start the service in background. Its output goes to log files: pipes nobody reads
+            # fill up (~64 KB) and then block the service
+            with open(SERVICE_STDOUT_LOG, "ab") as stdout, open(SERVICE_STDERR_LOG, "ab") as stderr:
+                process = subprocess.Popen([sys.executable, "main.py"], stdout=stdout, stderr=stderr)
+            print(f"✅ Service started with PID: {process.pid} (logs: {SERVICE_STDOUT_LOG}, {SERVICE_STDERR_LOG})")
             return process
         except Exception as e:
             print(f"❌ Failed to start service: {e}")
@@ -61,22 +103,67 @@ def start_service(method="python"):
         return False
 
 
-def check_service_health(url="http://localhost:8000", max_attempts=30):
-    """Check if the service is healthy"""
-    print(f"🏥 Checking service health at {url}...")
-
-    for attempt in range(max_attempts):
+@contextmanager
+def watch_process_exit(process):
+    """Yield wait(timeout): sleeps up to `timeout` seconds, returning True as soon as `process` has exited"""
+    selector = None
+    if process is not None:
         try:
-            response = requests.get(f"{url}/health", timeout=5)
-            if response.status_code == 200:
-                print("✅ Service is healthy and ready")
-                return True
-        except:
-            pass
+            # Readable once the child exits, so a crashed start is noticed without polling
+            pidfd = os.pidfd_open(process.pid)
+        except (AttributeError, OSError):
+            pass  # Non-Linux, Python < 3.9 or kernel < 5.3: plain sleep and poll()
+        else:
+            selector = selectors.DefaultSelector()
+            selector.register(pidfd, selectors.EVENT_READ)
+
+    def wait(timeout):
+        if selector is not None:
+            selector.select(timeout)
+        else:
+            time.sleep(timeout)
+        return process is not None and process.poll() is not None
+
+    try:
+        yield wait
+    finally:
+        if selector is not None:
+            selector.close()
+            os.close(pidfd)
 
-        if attempt < max_attempts - 1:
-            print(f"⏳ Waiting for service... (attempt {attempt + 1}/{max_attempts})")
-            time.sleep(2)
+
+def check_service_health(url="http://localhost:8000", timeout=60, process=None):
+    """Check if the service is healthy, giving up early if the service `process` exits"""
+    print(f"🏥 Checking service health at {url}...")
+
+    deadline = time.monotonic() + timeout
+    backoff = 0.1
+    long_poll = True
+    with httpx.Client(timeout=5) as client, watch_process_exit(process) as wait:
+        while True:
+            try:
+                if long_poll:
+                    # One request the service holds open until startup finishes, instead of repeated polls
+                    ready_timeout = max(0, min(30, deadline - time.monotonic()))
+                    response = client.get(f"{url}/ready", params={"timeout": ready_timeout}, timeout=ready_timeout + 5)
+                    # Services without /ready fall back to polling /health
+                    long_poll = response.status_code != 404
+                if not long_poll:
+                    response = client.get(f"{url}/health")
+                if response.status_code == 200:
+                    print("✅ Service is healthy and ready")
+                    return True
+            except httpx.HTTPError:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            print(f"⏳ Waiting for service... ({remaining:.0f}s left)")
+            if wait(min(backoff, remaining)):
+                print(f"❌ Service process exited with code {process.returncode}, see {SERVICE_STDERR_LOG}")
+                return False
+            backoff = min(backoff * 2, 2.0)
 
     print("❌ Service health check failed")
     return False
@@ -86,40 +173,44 @@ def run_initial_tests():
     """Run initial tests to verify service functionality"""
     print("🧪 Running initial tests...")
 
-    # Test health endpoint
-    try:
-        response = requests.get("http://localhost:8000/health", timeout=10)
-        if response.status_code != 200:
-            print("❌ Health endpoint test failed")
+    # Reuse one keep-alive connection for all checks
+    with requests.Session() as session:
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+
+        # Test health endpoint
+        try:
+            response = session.get("http://localhost:8000/health", timeout=10)
+            if response.status_code != 200:
+                print("❌ Health endpoint test failed")
+                return False
+            print("✅ Health endpoint test passed")
+        except Exception as e:
+            print(f"❌ Health endpoint test failed: {e}")
             return False
-        print("✅ Health endpoint test passed")
-    except Exception as e:
-        print(f"❌ Health endpoint test failed: {e}")
-        return False
 
-    # Test metrics endpoint
-    try:
-        response = requests.get("http://localhost:8000/metrics", timeout=10)
-        if response.status_code != 200:
-            print("❌ Metrics endpoint test failed")
+        # Test metrics endpoint
+        try:
+            response = session.get("http://localhost:8000/metrics", timeout=10)
+            if response.status_code != 200:
+                print("❌ Metrics endpoint test failed")
+                return False
+            print("✅ Metrics endpoint test passed")
+        except Exception as e:
+            print(f"❌ Metrics endpoint test failed: {e}")
             return False
-        print("✅ Metrics endpoint test passed")
-    except Exception as e:
-        print(f"❌ Metrics endpoint test failed: {e}")
-        return False
 
-    # Test authentication
-    try:
-        response = requests.get("http://localhost:8000/status", timeout=10)
-        if response.status_code != 401:
-            print("❌ Authentication test failed")
+        # Test authentication
+        try:
+            response = session.get("http://localhost:8000/status", timeout=10)
+            if response.status_code != 401:
+                print("❌ Authentication test failed")
+                return False
+            print("✅ Authentication test passed")
+        except Exception as e:
+            print(f"❌ Authentication test failed: {e}")
             return False
-        print("✅ Authentication test passed")
-    except Exception as e:
-        print(f"❌ Authentication test failed: {e}")
-        return False
 
-    return True
+        return True
 
 
 def main():
@@ -154,10 +245,9 @@ def main():
 
     # Step 4: Wait for service to be ready
     print("⏳ Waiting for service to be ready...")
-    time.sleep(5)
 
     # Step 5: Health check
-    if not check_service_health():
+    if not check_service_health(process=process if method == "python" else None):
         print("❌ Service failed to start properly")
         if method == "python" and 'process' in locals():
             process.terminate()
@@ -5,19 +5,33 @@ Ensures 100% success rate for the API Anomaly Detection System
 """
 
 import asyncio
-import json
 import os
+import random
 import subprocess
 import sys
 import threading
 import time
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import cached_property
 from typing import Any, Dict, List
 
+import httpx
 import numpy as np
+import orjson
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
+# Optional HTTP/2 for the performance burst (the httpx[http2] extra); HTTP/1.1 keep-alive is the fallback
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Cap on retained per-test results so long or looped runs don't grow without bound
+MAX_TEST_RESULTS = 10_000
 
 
 class PipelineTester:
@@ -27,60 +41,108 @@ class PipelineTester:
         self.base_url = base_url
         self.auth_token = "your-secret-token"
         self.headers = {"Authorization": f"Bearer {self.auth_token}"}
-        self.test_results = []
+        self.no_auth_headers = {"Authorization": None}
+        self.invalid_auth_headers = {"Authorization": "Bearer invalid-token"}
+        self.json_headers = {"Content-Type": "application/json"}
+
+        # Endpoint URLs are built once rather than formatted on every request
+        self.url_health = f"{base_url}/health"
+        self.url_ready = f"{base_url}/ready"
+        self.url_metrics = f"{base_url}/metrics"
+        self.url_status = f"{base_url}/status"
+        self.url_train = f"{base_url}/train"
+        self.url_detect = f"{base_url}/detect"
+        # Only the most recent results are kept; the pass/fail counters cover every logged test
+        self.test_results = deque(maxlen=MAX_TEST_RESULTS)
+        self.passed_tests = 0
+        self.failed_tests = 0
+        self.results_lock = threading.Lock()
+
+        # One keep-alive pool shared by every test, including the threads in test_performance
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0))
+
+    def post_json(self, url: str, payload: Any, timeout: float) -> requests.Response:
+        """POST a payload serialized by orjson, which is much faster than requests' stdlib json= encoding"""
+        return self.session.post(url, data=orjson.dumps(payload), headers=self.json_headers, timeout=timeout)
+
+    def close(self):
+        """Close the pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def log_test(self, test_name: str, success: bool, message: str = ""):
         """Log test result"""
         result = {"test": test_name, "success": success, "message": message, "timestamp": datetime.now().isoformat()}
-        self.test_results.append(result)
-
         status = "✅ PASS" if success else "❌ FAIL"
-        print(f"{status} {test_name}: {message}")
+
+        # Tests within a stage run on concurrent threads
+        with self.results_lock:
+            self.test_results.append(result)
+            if success:
+                self.passed_tests += 1
+            else:
+                self.failed_tests += 1
+            print(f"{status} {test_name}: {message}")
 
     def generate_test_data(self, count: int = 100, anomaly_ratio: float = 0.1) -> List[Dict]:
         """Generate test API logs"""
-        logs = []
-        base_time = datetime.now()
-
-        for i in range(count):
-            is_anomaly = i < int(count * anomaly_ratio)
-
-            if is_anomaly:
-                # Anomalous patterns
-                log = {
-                    "timestamp": (base_time + timedelta(minutes=i)).isoformat(),
-                    "user_id": f"user_{i % 10}",
-                    "endpoint": f"/api/anomalous/{i}",
-                    "method": "POST" if i % 3 == 0 else "GET",
-                    "status_code": 500 if i % 2 == 0 else 200,
-                    "response_time": 5.0 + np.random.normal(0, 2),
-                    "ip_address": f"192.168.1.{i % 255}",
-                    "user_agent": "SuspiciousBot/1.0",
-                    "request_size": 10000 + np.random.randint(0, 5000),
-                    "response_size": 50000 + np.random.randint(0, 10000),
-                }
-            else:
-                # Normal patterns
-                log = {
-                    "timestamp": (base_time + timedelta(minutes=i)).isoformat(),
-                    "user_id": f"user_{i % 10}",
-                    "endpoint": f"/api/normal/{i % 5}",
-                    "method": "GET" if i % 2 == 0 else "POST",
-                    "status_code": 200 if i % 10 != 0 else 404,
-                    "response_time": 0.1 + np.random.normal(0, 0.05),
-                    "ip_address": f"192.168.1.{i % 10}",
-                    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                    "request_size": 100 + np.random.randint(0, 500),
-                    "response_size": 1000 + np.random.randint(0, 2000),
-                }
-            logs.append(log)
-
-        return logs
+        idx = np.arange(count)
+        is_anomaly = idx < int(count * anomaly_ratio)
+        ids = pd.Series(idx).astype(str)
+
+        # Anomalous rows: slow, large, error-prone bot traffic; the rest are normal browser requests
+        logs = pd.DataFrame(
+            {
+                # One minute apart, formatted to ISO strings in a single vectorized call
+                "timestamp": np.datetime_as_string(
+                    np.datetime64(datetime.now(), "us") + idx.astype("timedelta64[m]"), unit="us"
+                ),
+                "user_id": "user_" + pd.Series(idx % 10).astype(str),
+                "endpoint": np.where(is_anomaly, "/api/anomalous/" + ids, "/api/normal/" + pd.Series(idx % 5).astype(str)),
+                "method": np.where(is_anomaly, np.where(idx % 3 == 0, "POST", "GET"), np.where(idx % 2 == 0, "GET", "POST")),
+                "status_code": np.where(is_anomaly, np.where(idx % 2 == 0, 500, 200), np.where(idx % 10 != 0, 200, 404)),
+                "response_time": np.where(
+                    is_anomaly, 5.0 + np.random.normal(0, 2, count), 0.1 + np.random.normal(0, 0.05, count)
+                ),
+                "ip_address": "192.168.1." + pd.Series(np.where(is_anomaly, idx % 255, idx % 10)).astype(str),
+                "user_agent": np.where(
+                    is_anomaly, "SuspiciousBot/1.0", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+                ),
+                "request_size": np.where(
+                    is_anomaly, 10000 + np.random.randint(0, 5000, count), 100 + np.random.randint(0, 500, count)
+                ),
+                "response_size": np.where(
+                    is_anomaly, 50000 + np.random.randint(0, 10000, count), 1000 + np.random.randint(0, 2000, count)
+                ),
+            }
+        )
+        return logs.to_dict("records")
+
+    @cached_property
+    def _log_pools(self):
+        """Anomalous and normal logs from a single generated master pool, split once on first use"""
+        master_logs = self.generate_test_data(2000, 0.15)
+        anomalous = [log for log in master_logs if log["user_agent"] == "SuspiciousBot/1.0"]
+        normal = [log for log in master_logs if log["user_agent"] != "SuspiciousBot/1.0"]
+        return anomalous, normal
+
+    def sample_test_data(self, count: int = 100, anomaly_ratio: float = 0.1) -> List[Dict]:
+        """Draw test API logs from the master pool at the requested anomaly ratio, without regenerating"""
+        anomalous, normal = self._log_pools
+        anomaly_count = int(count * anomaly_ratio)
+        return random.sample(anomalous, anomaly_count) + random.sample(normal, count - anomaly_count)
 
     def test_health_endpoint(self):
         """Test health endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/health", timeout=10)
+            response = self.session.get(self.url_health, timeout=10)
             success = response.status_code == 200
             self.log_test("Health Endpoint", success, f"Status: {response.status_code}")
             return success
@@ -91,7 +153,7 @@ class PipelineTester:
     def test_metrics_endpoint(self):
         """Test metrics endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/metrics", timeout=10)
+            response = self.session.get(self.url_metrics, timeout=10)
             success = response.status_code == 200 and "text/plain" in response.headers.get("content-type", "")
             self.log_test("Metrics Endpoint", success, f"Status: {response.status_code}")
             return success
@@ -103,18 +165,17 @@ class PipelineTester:
         """Test authentication"""
         try:
             # Test without auth
-            response = requests.get(f"{self.base_url}/status", timeout=10)
+            response = self.session.get(self.url_status, headers=self.no_auth_headers, timeout=10)
             success = response.status_code == 401
             self.log_test("Authentication (No Token)", success, f"Status: {response.status_code}")
 
             # Test with invalid token
-            headers = {"Authorization": "Bearer invalid-token"}
-            response = requests.get(f"{self.base_url}/status", headers=headers, timeout=10)
+            response = self.session.get(self.url_status, headers=self.invalid_auth_headers, timeout=10)
             success = response.status_code == 401
             self.log_test("Authentication (Invalid Token)", success, f"Status: {response.status_code}")
 
             # Test with valid token
-            response = requests.get(f"{self.base_url}/status", headers=self.headers, timeout=10)
+            response = self.session.get(self.url_status, timeout=10)
             success = response.status_code == 200
             self.log_test("Authentication (Valid Token)", success, f"Status: {response.status_code}")
 
@@ -126,13 +187,13 @@ class PipelineTester:
     def test_model_training(self):
         """Test model training"""
         try:
-            training_data = {"logs": self.generate_test_data(1000, 0.1), "test_size": 0.2}
+            training_data = {"logs": self.sample_test_data(1000, 0.1), "test_size": 0.2}
 
-            response = requests.post(f"{self.base_url}/train", json=training_data, headers=self.headers, timeout=60)
+            response = self.post_json(self.url_train, training_data, timeout=60)
 
             success = response.status_code == 200
             if success:
-                data = response.json()
+                data = orjson.loads(response.content)
                 success = data.get("status") == "success"
                 self.log_test("Model Training", success, f"Training samples: {data.get('training_samples', 0)}")
             else:
@@ -146,14 +207,14 @@ class PipelineTester:
     def test_anomaly_detection(self):
         """Test anomaly detection"""
         try:
-            test_logs = self.generate_test_data(50, 0.2)
+            test_logs = self.sample_test_data(50, 0.2)
             detection_data = {"logs": test_logs, "threshold": -0.5}
 
-            response = requests.post(f"{self.base_url}/detect", json=detection_data, headers=self.headers, timeout=30)
+            response = self.post_json(self.url_detect, detection_data, timeout=30)
 
             success = response.status_code == 200
             if success:
-                data = response.json()
+                data = orjson.loads(response.content)
                 success = "anomalies" in data and "total_logs" in data
                 self.log_test(
                     "Anomaly Detection", success, f"Anomalies: {data.get('anomaly_count', 0)}/{data.get('total_logs', 0)}"
@@ -169,11 +230,11 @@ class PipelineTester:
     def test_model_status(self):
         """Test model status"""
         try:
-            response = requests.get(f"{self.base_url}/status", headers=self.headers, timeout=10)
+            response = self.session.get(self.url_status, timeout=10)
 
             success = response.status_code == 200
             if success:
-                data = response.json()
+                data = orjson.loads(response.content)
                 success = "is_trained" in data
                 self.log_test("Model Status", success, f"Trained: {data.get('is_trained', False)}")
             else:
@@ -188,25 +249,29 @@ class PipelineTester:
         """Test performance under load"""
         try:
 
-            def make_request():
-                try:
-                    response = requests.get(f"{self.base_url}/health", timeout=5)
-                    return response.status_code == 200
-                except:
-                    return False
+            async def make_requests():
+                # One event loop and one keep-alive pool wide enough for the whole burst. Where the server
+                # negotiates HTTP/2 (https via ALPN) the burst is multiplexed over a single connection instead
+                limits = httpx.Limits(max_connections=100, max_keepalive_connections=100)
+                async with httpx.AsyncClient(http2=h2 is not None, limits=limits, timeout=5) as client:
+                    return await asyncio.gather(*[client.get(self.url_health) for _ in range(100)], return_exceptions=True)
 
             # Test with concurrent requests
             start_time = time.time()
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                futures = [executor.submit(make_request) for _ in range(100)]
-                results = [f.result() for f in as_completed(futures)]
+            responses = asyncio.run(make_requests())
+            results = [isinstance(r, httpx.Response) and r.status_code == 200 for r in responses]
 
             end_time = time.time()
             duration = end_time - start_time
             success_rate = sum(results) / len(results)
+            protocols = sorted({r.http_version for r in responses if isinstance(r, httpx.Response)})
 
             success = success_rate >= 0.95 and duration < 30
-            self.log_test("Performance Test", success, f"Success rate: {success_rate:.2%}, Duration: {duration:.2f}s")
+            self.log_test(
+                "Performance Test",
+                success,
+                f"Success rate: {success_rate:.2%}, Duration: {duration:.2f}s, Protocol: {'/'.join(protocols) or 'n/a'}",
+            )
 
             return success
         except Exception as e:
@@ -217,12 +282,12 @@ class PipelineTester:
         """Test error handling"""
         try:
             # Test malformed JSON
-            response = requests.post(f"{self.base_url}/train", data="invalid json", headers=self.headers, timeout=10)
+            response = self.session.post(self.url_train, data="invalid json", timeout=10)
             success = response.status_code == 422
             self.log_test("Error Handling (Malformed JSON)", success, f"Status: {response.status_code}")
 
             # Test missing required fields
-            response = requests.post(f"{self.base_url}/train", json={}, headers=self.headers, timeout=10)
+            response = self.post_json(self.url_train, {}, timeout=10)
             success = response.status_code == 422
             self.log_test("Error Handling (Missing Fields)", success, f"Status: {response.status_code}")
 
@@ -250,7 +315,7 @@ class PipelineTester:
                 ]
             }
 
-            response = requests.post(f"{self.base_url}/train", json=invalid_data, headers=self.headers, timeout=10)
+            response = self.post_json(self.url_train, invalid_data, timeout=10)
 
             success = response.status_code == 422
             self.log_test("Data Validation", success, f"Status: {response.status_code}")
@@ -264,29 +329,29 @@ class PipelineTester:
         """Test complete integration workflow"""
         try:
             # Step 1: Train model
-            training_data = {"logs": self.generate_test_data(500, 0.1), "test_size": 0.2}
+            training_data = {"logs": self.sample_test_data(500, 0.1), "test_size": 0.2}
 
-            response = requests.post(f"{self.base_url}/train", json=training_data, headers=self.headers, timeout=60)
+            response = self.post_json(self.url_train, training_data, timeout=60)
 
             if response.status_code != 200:
                 self.log_test("Integration Workflow", False, "Training failed")
                 return False
 
             # Step 2: Check status
-            response = requests.get(f"{self.base_url}/status", headers=self.headers, timeout=10)
+            response = self.session.get(self.url_status, timeout=10)
             if response.status_code != 200:
                 self.log_test("Integration Workflow", False, "Status check failed")
                 return False
 
             # Step 3: Detect anomalies
-            test_logs = self.generate_test_data(50, 0.2)
+            test_logs = self.sample_test_data(50, 0.2)
             detection_data = {"logs": test_logs, "threshold": -0.5}
 
-            response = requests.post(f"{self.base_url}/detect", json=detection_data, headers=self.headers, timeout=30)
+            response = self.post_json(self.url_detect, detection_data, timeout=30)
 
             success = response.status_code == 200
             if success:
-                data = response.json()
+                data = orjson.loads(response.content)
                 success = "anomalies" in data and "total_logs" in data
                 self.log_test("Integration Workflow", success, f"Complete workflow successful")
             else:
@@ -302,28 +367,33 @@ class PipelineTester:
         print("🧪 Starting Comprehensive Pipeline Tests")
         print("=" * 50)
 
-        tests = [
-            self.test_health_endpoint,
-            self.test_metrics_endpoint,
-            self.test_authentication,
-            self.test_model_training,
-            self.test_anomaly_detection,
-            self.test_model_status,
-            self.test_performance,
-            self.test_error_handling,
-            self.test_data_validation,
-            self.test_integration_workflow,
+        # Stages run in order; the tests inside a stage don't depend on each other and run concurrently
+        stages = [
+            [
+                self.test_health_endpoint,
+                self.test_metrics_endpoint,
+                self.test_authentication,
+                self.test_error_handling,
+                self.test_data_validation,
+            ],
+            [self.test_model_training],
+            [self.test_anomaly_detection, self.test_model_status, self.test_integration_workflow],
+            # The timed burst runs alone so other tests' traffic doesn't skew it
+            [self.test_performance],
         ]
 
         passed = 0
-        total = len(tests)
-
-        for test in tests:
-            try:
-                if test():
-                    passed += 1
-            except Exception as e:
-                print(f"❌ Test {test.__name__} failed with exception: {e}")
+        total = sum(len(stage) for stage in stages)
+
+        for stage in stages:
+            with ThreadPoolExecutor(max_workers=len(stage)) as executor:
+                futures = {executor.submit(test): test for test in stage}
+                for future in as_completed(futures):
+                    try:
+                        if future.result():
+                            passed += 1
+                    except Exception as e:
+                        print(f"❌ Test {futures[future].__name__} failed with exception: {e}")
 
         print("=" * 50)
         print(f"📊 Test Results: {passed}/{total} tests passed")
@@ -337,19 +407,18 @@ class PipelineTester:
 
     def generate_report(self):
         """Generate test report"""
+        total_tests = self.passed_tests + self.failed_tests
         report = {
             "timestamp": datetime.now().isoformat(),
-            "total_tests": len(self.test_results),
-            "passed_tests": sum(1 for r in self.test_results if r["success"]),
-            "failed_tests": sum(1 for r in self.test_results if not r["success"]),
-            "success_rate": (
-                sum(1 for r in self.test_results if r["success"]) / len(self.test_results) if self.test_results else 0
-            ),
-            "results": self.test_results,
+            "total_tests": total_tests,
+            "passed_tests": self.passed_tests,
+            "failed_tests": self.failed_tests,
+            "success_rate": self.passed_tests / total_tests if total_tests else 0,
+            "results": list(self.test_results),
         }
 
-        with open("pipeline_test_report.json", "w") as f:
-            json.dump(report, f, indent=2)
+        with open("pipeline_test_report.json", "wb") as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY))
 
         print(f"📄 Test report saved to pipeline_test_report.json")
         return report
@@ -365,27 +434,40 @@ def main():
 
     args = parser.parse_args()
 
-    tester = PipelineTester(args.url)
-
-    # Wait for service to be ready
-    print("⏳ Waiting for service to be ready...")
-    for i in range(30):
-        try:
-            response = requests.get(f"{args.url}/health", timeout=5)
-            if response.status_code == 200:
-                print("✅ Service is ready!")
-                break
-        except:
-            if i == 29:
+    with PipelineTester(args.url) as tester:
+        # Wait for service to be ready
+        print("⏳ Waiting for service to be ready...")
+        deadline = time.monotonic() + 60
+        backoff = 0.1
+        long_poll = True
+        while True:
+            try:
+                if long_poll:
+                    # The service holds /ready open until startup finishes
+                    ready_timeout = max(0, min(30, deadline - time.monotonic()))
+                    response = tester.session.get(
+                        tester.url_ready, params={"timeout": ready_timeout}, timeout=ready_timeout + 5
+                    )
+                    # Services without /ready fall back to polling /health
+                    long_poll = response.status_code != 404
+                if not long_poll:
+                    response = tester.session.get(tester.url_health, timeout=5)
+                if response.status_code == 200:
+                    print("✅ Service is ready!")
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() + backoff > deadline:
                 print("❌ Service is not responding. Please start the service first.")
                 sys.exit(1)
-            time.sleep(2)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 2.0)
 
-    # Run tests
-    success = tester.run_all_tests()
+        # Run tests
+        success = tester.run_all_tests()
 
-    if args.report:
-        tester.generate_report()
+        if args.report:
+            tester.generate_report()
 
     sys.exit(0 if success else 1)
 